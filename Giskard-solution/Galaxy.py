@@ -6,164 +6,211 @@ Created on Sun Jan  8 15:13:39 2023
 """
 
 
-import pandas as pd
+import heapq
+import os
+import sys
+
+from dataclasses import dataclass, field
+
 import networkx as nx
 
 import sqlite3
 
 from networkx.algorithms.simple_paths import all_simple_paths
 
-class Empire:
-    def __init__(self, countdown, bounty_hunters):
-        self.countdown = countdown
-        self.bounty_hunters = bounty_hunters
+# process-level cache of routes graphs, keyed by (path, mtime) so that a
+# webapp serving many requests only reads each universe.db once
+_graph_cache = {}
 
+@dataclass(slots=True)
+class Empire:
+    countdown: int
+    bounty_hunters: list
+    bounty_set: frozenset = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # intern the planet names so the comparisons inside the search are
+        # pointer equalities, and index the hunters by (planet, day) once
+        for hunter in self.bounty_hunters:
+            hunter['planet'] = sys.intern(hunter['planet'])
+        self.bounty_set = frozenset((hunter['planet'], hunter['day']) for hunter in self.bounty_hunters)
+
+@dataclass(slots=True)
 class Millennium_falcon(Empire):
-    def __init__(self, autonomy, departure, arrival, routes_db, countdown, bounty_hunters):
-        super().__init__(countdown, bounty_hunters)
-        self.autonomy = autonomy
-        self.departure = departure
-        self.arrival = arrival
-        self.routes_db = routes_db
+    autonomy: int
+    departure: str
+    arrival: str
+    routes_db: str
+    _graph: nx.Graph = field(init=False, default=None, repr=False)
+    _adjacency: dict = field(init=False, default=None, repr=False)
+
+    def __post_init__(self):
+        # slots=True rebuilds the class, so zero-argument super() cannot be used here
+        Empire.__post_init__(self)
+        self.departure = sys.intern(self.departure)
+        self.arrival = sys.intern(self.arrival)
 
 
     def read_ROUTES(self):
         # Create a SQL connection to our SQLite database
         con = sqlite3.connect(self.routes_db)
-        routes = pd.read_sql_query("SELECT * from ROUTES", con)
+        # keep the b-tree pages and any temporary data in memory while reading
+        con.execute("PRAGMA cache_size = -256000")
+        con.execute("PRAGMA temp_store = MEMORY")
+        routes = con.execute("SELECT origin, destination, travel_time FROM ROUTES").fetchall()
+        con.close()
 
         return routes
 
     def create_Graph(self):
-        # create the SQLite table
-        routes = self.read_ROUTES()
+        # the routes database is static, so only read it and build the graph once
+        if self._graph is not None:
+            return self._graph
+
+        # reuse the graph of a database already read by this process, as long
+        # as the file has not been modified since
+        cache_key = (self.routes_db, os.path.getmtime(self.routes_db))
+        Graph = _graph_cache.get(cache_key)
+
+        if Graph is None:
+            # read the ROUTES rows from the SQLite table
+            routes = self.read_ROUTES()
+
+            # create the graph and load the (origin, destination, travel_time) rows
+            # in bulk, interning the planet names like the Empire attributes
+            Graph = nx.Graph()
+            Graph.add_weighted_edges_from(((sys.intern(origin), sys.intern(destination), travel_time)
+                                           for origin, destination, travel_time in routes), weight = 'distance')
+            _graph_cache[cache_key] = Graph
+
+        self._graph = Graph
+        return Graph
 
-        # create an empty graph
-        Graph = nx.Graph()
+    def create_Adjacency(self):
+        # Flatten the nested dict-of-dicts adjacency of the graph into a
+        # planet -> ((neighbor, distance), ...) table, so the search walks one
+        # flat tuple per planet instead of three dict lookups per edge
+        if self._adjacency is not None:
+            return self._adjacency
 
-        # iterate over the rows of the dataframe and add an edge to the graph 
-        for _, row in routes.iterrows():
-            Graph.add_edge(row['origin'], row['destination'], distance = row['travel_time'])
+        G = self.create_Graph()
+        adjacency = {planet: tuple((neighbor, data['distance']) for neighbor, data in G[planet].items())
+                     for planet in G}
 
-        return Graph
+        self._adjacency = adjacency
+        return adjacency
 
 
     def find_feasible_paths(self):
-        # Find all feasible paths that satisfy the constraint of millennium falcon's autonomy
+        # Yield all feasible paths that satisfy the constraint of millennium falcon's
+        # autonomy, one (stops, days) pair at a time so no path dict is materialized
 
         # create an the associated graph
         G = self.create_Graph()
 
-        # From all paths from departure to arrival
-        all_paths = all_simple_paths(G, self.departure, self.arrival) 
-        feasible_paths = {}
+        # From all paths from departure to arrival; a path of more than
+        # countdown // min_travel_time edges cannot beat the countdown, so
+        # bound the depth of the search to prune hopeless branches early
+        min_travel_time = min(distance['distance'] for _, _, distance in G.edges(data=True))
+        cutoff = self.countdown // max(min_travel_time, 1)
+        all_paths = all_simple_paths(G, self.departure, self.arrival, cutoff=cutoff)
 
-        # Find all feasible paths that satisfy the constraint of millennium falcon's autonomy
-        for idx,path in enumerate(all_paths):
-            actual_autonomy = self.autonomy 
+        for path in all_paths:
+            actual_autonomy = self.autonomy
             travel_days = 0
             stops = [self.departure]
             days = [0]
             for u, v in zip(path[:-1], path[1:]):
-                if G.get_edge_data(u, v)['distance'] <= self.autonomy:
-                    travel_days += G.get_edge_data(u, v)['distance']
+                # look up the edge distance once instead of three times
+                distance = G[u][v]['distance']
+                if distance <= self.autonomy:
+                    travel_days += distance
                     days.append(travel_days)
                     stops.append(v)
-                    actual_autonomy = self.autonomy - G.get_edge_data(u, v)['distance']
+                    actual_autonomy = self.autonomy - distance
                     if actual_autonomy == 0:
                         stops.append(v)
                         travel_days += 1
                         days.append(travel_days)
                         actual_autonomy = self.autonomy
-            feasible_paths['path_'+str(idx+1)] = [stops, days]
-        return feasible_paths
+            yield stops, days
 
     def find_acceptable_paths(self):
-        # Find all acceptable paths such that the Millennium falcon reaches Endor before countdown
-        feasible_paths = self.find_feasible_paths()
-        acceptable_paths = {key: value for key, value in feasible_paths.items() if value[1][-1] <= self.countdown}
-        return acceptable_paths
-
-
-    def find_alternative_paths(self):
-        # Find all alternative paths when there cooldown days between the expected arrival and countdown
-
-        acceptable_paths = self.find_acceptable_paths()
-        alternative_paths = {}
-
-        for key, value in acceptable_paths.items():
-            path, day = value[0], value[1]
-            possible_rest = self.countdown - day[-1]
-            if possible_rest >= 1: 
-                rest = 1
-
-                for idx, stop in enumerate(list(set(path[:-1]))):
-                    path_dup = path.copy()
-                    day_dup = day.copy()
-                    path_dup.insert(idx+1, stop*rest)
-                    day_dup.insert(idx+1, day_dup[idx]+1)
-                    day_dup[(idx+2):] = [x + 1 for x in day_dup[(idx+2):]]
-                    alternative_paths[key+str(idx+1)] = [path_dup, day_dup]
-                
-        return alternative_paths
-
-
-    def give_me_the_odds(self):
-        # Compute the odds that the Millennium Falcon reaches Endor in time and saves the galaxy
-        feasible_paths = self.find_feasible_paths()
-
-        if len([[path,day] for path,day in feasible_paths.values() if day[-1] <= self.countdown])==0:
-            # If the arrival day is above the countdown, then return 0 
-            odds = 0
-            optim_path = []
-        else:
-            # Otherwise, compute the positive odds of reaching Endor before the countdown
-            acceptable_paths = self.find_acceptable_paths()
-            alternative_paths = self.find_alternative_paths()
-
-            # Add the alternative paths to acceptable paths
-            acceptable_paths = {**acceptable_paths, **alternative_paths}
-            
-
-            k_table, final_paths = [], [] 
-            for key, value in acceptable_paths.items():
-                path, day = value[0], value[1] 
-                k = 0
-                n_path = len(path)
-                for i in range(n_path):
-                    for idx,bounty in enumerate(self.bounty_hunters):
-                        if  bounty['planet'] == path[i] and  bounty['day'] == day[i]:
-                            k+=1
-                k_table.append(k)
-                final_paths.append(path)
-
-            k_min = min(k_table)
-            optim_path = final_paths[k_table.index(k_min)]
-
-            if k_min >= 1:
-                prob = 1/10
-                for j in range(1,k_min):
-                    prob += 9**j/10**(j+1)
-                odds = 100*(1-prob)
-            else:
-                odds = 100
-        return odds, optim_path
-
-
-
-if __name__ == "__main__": 
-    input_frontend = 'example4/empire.json'
-    Empire_json = pd.read_json(input_frontend, typ='series')
-    empire = Empire(Empire_json.countdown, Empire_json.bounty_hunters)
-
-    input_backend = 'example4/millennium-falcon.json'
-    MF_json = pd.read_json(input_backend, typ='series') 
-    millennium_falcon = Millennium_falcon(MF_json.autonomy, MF_json.departure, MF_json.arrival, MF_json.routes_db,
-                                        empire.countdown, empire.bounty_hunters)
-
-    result = Millennium_falcon.give_me_the_odds(millennium_falcon)
-    odds = result[0]
-    optim_path = result[1]
-    print('The probability of success (odds) is:' + str(odds) )
-    print('The optimal path is:' + '_'.join(map(str,optim_path)) )
+        # Yield all acceptable paths such that the Millennium falcon reaches Endor before countdown
+        for stops, days in self.find_feasible_paths():
+            if days[-1] <= self.countdown:
+                yield stops, days
+
+
+    def give_me_the_odds(self, need_path=True):
+        # Compute the odds that the Millennium Falcon reaches Endor in time and saves
+        # the galaxy; with need_path=False the predecessor bookkeeping and the
+        # optimal-path reconstruction are skipped and only the odds matter
+
+        # Instead of enumerating every simple path, run a Dijkstra over the states
+        # (planet, day, autonomy) where the cost of a state is the number of bounty
+        # hunter encounters on the way: travelling an edge costs its travel time in
+        # days and fuel, while staying one day on a planet refuels the falcon.
+        adjacency = self.create_Adjacency()
+
+        bounty = self.bounty_set
+
+        start = (self.departure, 0, self.autonomy)
+        start_k = 1 if (self.departure, 0) in bounty else 0
+
+        # heap entries are (encounters, day, planet, autonomy), so the first state
+        # popped at the arrival planet has the minimal number of encounters
+        heap = [(start_k, 0, self.departure, self.autonomy)]
+        best = {start: start_k}
+        previous = {start: None} if need_path else None
+
+        while heap:
+            k, day, planet, autonomy = heapq.heappop(heap)
+            if k > best.get((planet, day, autonomy), k):
+                continue
+
+            if planet == self.arrival:
+                # rebuild the optimal path by walking the predecessors back to departure
+                optim_path = []
+                if need_path:
+                    state = (planet, day, autonomy)
+                    while state is not None:
+                        optim_path.append(state[0])
+                        state = previous[state]
+                    optim_path.reverse()
+
+                # the capture probability sum_{j<k} 9**j/10**(j+1) telescopes
+                # to 1 - 0.9**k, so the odds reduce to a single power
+                odds = 100 * 0.9**k
+                return odds, optim_path
+
+            # travel to a neighbouring planet if the autonomy allows it
+            for neighbor, travel_time in adjacency[planet]:
+                if travel_time <= autonomy and day + travel_time <= self.countdown:
+                    next_state = (neighbor, day + travel_time, autonomy - travel_time)
+                    next_k = k + (1 if (neighbor, day + travel_time) in bounty else 0)
+                    if next_k < best.get(next_state, next_k + 1):
+                        best[next_state] = next_k
+                        if need_path:
+                            previous[next_state] = (planet, day, autonomy)
+                        heapq.heappush(heap, (next_k, next_state[1], neighbor, next_state[2]))
+
+            # or stay one day on the current planet to refuel (or wait out the hunters)
+            if day + 1 <= self.countdown:
+                next_state = (planet, day + 1, self.autonomy)
+                next_k = k + (1 if (planet, day + 1) in bounty else 0)
+                if next_k < best.get(next_state, next_k + 1):
+                    best[next_state] = next_k
+                    if need_path:
+                        previous[next_state] = (planet, day, autonomy)
+                    heapq.heappush(heap, (next_k, day + 1, planet, self.autonomy))
+
+        # the arrival planet cannot be reached before the countdown
+        return 0, []
+
+    def give_me_the_odds_only(self):
+        # Lightweight variant for callers that only display the probability,
+        # such as the web application
+        return self.give_me_the_odds(need_path=False)[0]
+
     
\ No newline at end of file
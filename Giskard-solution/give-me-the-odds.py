@@ -5,7 +5,7 @@ Created on Sun Jan  8 15:31:19 2023
 @author: nacha
 """
 from Galaxy import *
-import pandas as pd
+import json
 import argparse
 
 parser = argparse.ArgumentParser(description = 'Process the json files.')
@@ -15,12 +15,15 @@ parser.add_argument('file2', type = str, help = 'The path to the second file')
 
 args = parser.parse_args()
 
-MF_json = pd.read_json(args.file1, typ='series') 
-Empire_json = pd.read_json(args.file2, typ='series')
+with open(args.file1) as f:
+    MF_json = json.load(f)
+with open(args.file2) as f:
+    Empire_json = json.load(f)
 
-empire = Empire(Empire_json.countdown, Empire_json.bounty_hunters)
-millennium_falcon = Millennium_falcon(MF_json.autonomy, MF_json.departure, MF_json.arrival, MF_json.routes_db,
-                                    empire.countdown, empire.bounty_hunters)
+empire = Empire(Empire_json['countdown'], Empire_json['bounty_hunters'])
+millennium_falcon = Millennium_falcon(autonomy=MF_json['autonomy'], departure=MF_json['departure'],
+                                    arrival=MF_json['arrival'], routes_db=MF_json['routes_db'],
+                                    countdown=empire.countdown, bounty_hunters=empire.bounty_hunters)
 
 result = Millennium_falcon.give_me_the_odds(millennium_falcon)
 odds = result[0]
@@ -7,29 +7,47 @@ Created on Sun Jan  8 22:35:54 2023
 
 
 from flask import Flask, request, render_template
-from werkzeug.utils import secure_filename
-from Galaxy import *
+from functools import lru_cache
 
-import pandas as pd
+import json
 import os
 
-UPLOAD_FOLDER = './uploads'
-ALLOWED_EXTENSIONS = {'json'}
 INPUT_BACKEND = './millennium-falcon.json'
 
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-def compute_the_odds(input_frontend):
-    Empire_json = pd.read_json(input_frontend, typ='series')
-    empire = Empire(Empire_json.countdown, Empire_json.bounty_hunters)
+@lru_cache(maxsize=8)
+def _load_backend_config(path, mtime):
+    # the millennium-falcon.json config rarely changes between requests;
+    # mtime in the key reloads it when it does
+    with open(path) as f:
+        return json.load(f)
 
-    MF_json = pd.read_json(INPUT_BACKEND, typ='series') 
-    millennium_falcon = Millennium_falcon(MF_json.autonomy, MF_json.departure, MF_json.arrival, MF_json.routes_db,
-                                        empire.countdown, empire.bounty_hunters)
-    result = Millennium_falcon.give_me_the_odds(millennium_falcon)
-    odds = result[0]
+@lru_cache(maxsize=128)
+def _compute_odds(routes_db, routes_db_mtime, autonomy, departure, arrival, countdown, bounty_hunters):
+    # memoized on primitive arguments only; routes_db_mtime invalidates the
+    # cache whenever the database file is edited
+    # imported lazily so that serving the landing page does not pay for
+    # networkx and the rest of the graph machinery
+    from Galaxy import Empire, Millennium_falcon
+
+    empire = Empire(countdown, [{'planet': planet, 'day': day} for planet, day in bounty_hunters])
+    millennium_falcon = Millennium_falcon(autonomy=autonomy, departure=departure,
+                                        arrival=arrival, routes_db=routes_db,
+                                        countdown=empire.countdown, bounty_hunters=empire.bounty_hunters)
+    # the web page only displays the probability, so skip the path bookkeeping
+    return millennium_falcon.give_me_the_odds_only()
+
+def compute_the_odds(Empire_json):
+    MF_json = _load_backend_config(INPUT_BACKEND, os.path.getmtime(INPUT_BACKEND))
+
+    # sort the hunters so that two uploads listing them in a different order
+    # still hit the same cache entry
+    bounty_hunters = tuple(sorted((hunter['planet'], hunter['day']) for hunter in Empire_json['bounty_hunters']))
+    odds = _compute_odds(MF_json['routes_db'], os.path.getmtime(MF_json['routes_db']),
+                         MF_json['autonomy'], MF_json['departure'], MF_json['arrival'],
+                         Empire_json['countdown'], bounty_hunters)
     return odds
 
 @app.route("/")
@@ -47,9 +65,16 @@ def get_me_the_odds():
         # empty file without a filename.
         if file.filename == '':
             return "No file provided"
-        if file:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-        return str(compute_the_odds(filepath))
+        # parse the upload straight from the request stream; saving it to
+        # disk and reading it back doubled the I/O for nothing
+        try:
+            Empire_json = json.load(file.stream)
+        except ValueError:
+            # bail out before any graph work when the upload is not valid JSON
+            return "Invalid json file"
+        # check the required keys up front, before any Empire or graph work
+        for key in ('countdown', 'bounty_hunters'):
+            if key not in Empire_json:
+                return "Missing '" + key + "' in the empire json file"
+        return str(compute_the_odds(Empire_json))
 